@@ -2,8 +2,8 @@ const express = require('express');
 const multer = require('multer');
 const path = require('path');
 const fs = require('fs');
-const { execFile } = require('child_process');
 const pdfParse = require('pdf-parse');
+const PythonWorker = require('../lib/pythonWorker');
 
 const router = express.Router();
 
@@ -11,6 +11,12 @@ const UPLOAD_DIR = process.env.UPLOAD_DIR || './uploads/';
 const PYTHON_PATH = process.env.PYTHON_PATH || path.join(__dirname, '../venv/Scripts/python.exe');
 const SPACY_SCRIPT = path.join(__dirname, '../python/extractor.py');
 
+// Persistent extractor process: spaCy + sentence-transformer models load once
+const extractorWorker = new PythonWorker(PYTHON_PATH, SPACY_SCRIPT, {
+  cwd: path.join(__dirname, '..'),
+  name: 'extractor'
+});
+
 // Setup Multer for file upload
 const storage = multer.diskStorage({
   destination: function (req, file, cb) {
@@ -76,47 +82,23 @@ router.post('/', upload.single('file'), async (req, res) => {
     const cleanText = sanitizeText(rawText);
     console.log('Sanitized text length:', cleanText.length);
 
-    // Spawn Python process
+    // Send sanitized text to the persistent Python worker
     console.log('Passing to Python:', cleanText.substring(0, 200));
-    
-    const pythonProcess = execFile(
-      PYTHON_PATH,
-      [SPACY_SCRIPT],
-      { 
-        maxBuffer: 10 * 1024 * 1024,
-        cwd: path.join(__dirname, '..')
-      },
-      (error, stdout, stderr) => {
-        if (error) {
-          console.error('Python error:', error, stderr);
-          return res.status(500).json({ 
-            error: 'Entity extraction failed', 
-            details: stderr,
-            pythonError: error.message
-          });
-        }
-
-        if (stderr) {
-          console.log('Python stderr:', stderr);
-        }
-
-        try {
-          const graphData = JSON.parse(stdout);
-          console.log(`✅ Extraction complete: ${graphData.nodes?.length || 0} nodes, ${graphData.edges?.length || 0} edges`);
-          res.json(graphData);
-        } catch (parseError) {
-          console.error('Failed to parse Python output:', stdout);
-          res.status(500).json({ 
-            error: 'Invalid Python output',
-            raw: stdout.substring(0, 500)
-          });
-        }
-      }
-    );
 
-    // Write sanitized text to Python stdin
-    pythonProcess.stdin.write(cleanText, 'utf8');
-    pythonProcess.stdin.end();
+    let graphData;
+    try {
+      ({ result: graphData } = await extractorWorker.request({ text: cleanText }));
+    } catch (workerError) {
+      console.error('Python error:', workerError);
+      return res.status(500).json({ 
+        error: 'Entity extraction failed', 
+        details: workerError.message,
+        pythonError: workerError.message
+      });
+    }
+
+    console.log(`✅ Extraction complete: ${graphData.nodes?.length || 0} nodes, ${graphData.edges?.length || 0} edges`);
+    res.json(graphData);
 
   } catch (error) {
     console.error('Extraction error:', error);
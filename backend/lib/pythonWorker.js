@@ -0,0 +1,116 @@
+// lib/pythonWorker.js
+// Long-lived Python worker speaking newline-delimited JSON over stdin/stdout.
+// Models stay loaded between requests; replies are matched to requests by id.
+const { spawn } = require('child_process');
+const readline = require('readline');
+
+class PythonWorker {
+  constructor(pythonPath, scriptPath, options = {}) {
+    this.pythonPath = pythonPath;
+    this.scriptPath = scriptPath;
+    this.cwd = options.cwd;
+    this.name = options.name || 'python-worker';
+    this.timeoutMs = options.timeoutMs || 5 * 60 * 1000;
+    this.process = null;
+    this.pending = new Map();
+    this.nextId = 1;
+  }
+
+  // Spawn lazily; a crashed worker is respawned on the next request
+  start() {
+    if (this.process) return this.process;
+
+    const child = spawn(this.pythonPath, [this.scriptPath, '--serve'], {
+      cwd: this.cwd,
+      env: { ...process.env, PYTHONIOENCODING: 'utf-8' }
+    });
+
+    readline.createInterface({ input: child.stdout }).on('line', (line) => this.handleLine(line));
+
+    // Worker logs go to stderr; forward them line by line
+    readline.createInterface({ input: child.stderr }).on('line', (line) => {
+      console.log(`[${this.name}] ${line}`);
+    });
+
+    // A worker that dies mid-write surfaces as EPIPE on stdin; fail its jobs instead of crashing the server
+    child.stdin.on('error', (error) => this.handleExit(child, error));
+    child.on('error', (error) => this.handleExit(child, error));
+    child.on('exit', (code, signal) => {
+      this.handleExit(child, new Error(`${this.name} exited (code ${code}, signal ${signal})`));
+    });
+
+    this.process = child;
+    return child;
+  }
+
+  handleLine(line) {
+    if (!line.trim()) return;
+
+    let reply;
+    try {
+      reply = JSON.parse(line);
+    } catch (parseError) {
+      console.error(`[${this.name}] Invalid worker output:`, line.substring(0, 500));
+      return;
+    }
+
+    const entry = this.pending.get(reply.id);
+    if (!entry) return;
+
+    this.pending.delete(reply.id);
+    clearTimeout(entry.timer);
+    this.startHeadTimer();
+
+    if (reply.error) {
+      entry.reject(new Error(reply.error));
+    } else {
+      entry.resolve(reply);
+    }
+  }
+
+  // The worker runs jobs one at a time in arrival order, so only the oldest pending job is
+  // actually running: its timer starts when it reaches the head of the queue, not when queued
+  startHeadTimer() {
+    const head = this.pending.entries().next().value;
+    if (!head || head[1].timer) return;
+
+    const [id, entry] = head;
+    const child = this.process;
+    entry.timer = setTimeout(() => {
+      this.pending.delete(id);
+      entry.reject(new Error(`${this.name} timed out after ${this.timeoutMs} ms`));
+
+      // The child is stuck on this job and everything queued behind it would wait on it:
+      // fail them now and let the next request respawn
+      this.handleExit(child, new Error(`${this.name} restarted after a timed-out job`));
+      child.kill();
+    }, this.timeoutMs);
+  }
+
+  // Only the current child may fail pending jobs; late events from a replaced child are ignored
+  handleExit(child, error) {
+    if (!this.process || child !== this.process) return;
+    this.process = null;
+
+    for (const entry of this.pending.values()) {
+      clearTimeout(entry.timer);
+      entry.reject(error);
+    }
+    this.pending.clear();
+  }
+
+  // Send one job ({ text } / { texts } / ...) and resolve with the worker's reply
+  request(payload) {
+    const child = this.start();
+    const id = this.nextId++;
+
+    return new Promise((resolve, reject) => {
+      // Map keeps insertion order: pending doubles as the FIFO of queued job ids
+      this.pending.set(id, { resolve, reject, timer: null });
+      this.startHeadTimer();
+      child.stdin.write(JSON.stringify({ ...payload, id }) + '\n', 'utf8');
+    });
+  }
+}
+
+module.exports = PythonWorker;
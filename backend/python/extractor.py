@@ -11,14 +11,23 @@ ARCHITECTURE:
 - Layer 5: Lazy WikiData (on-demand, +2%)
 """
 
+import os
 import sys
+import shutil
+import tempfile
 import json
 import spacy
+from spacy.matcher import PhraseMatcher
 import re
-import requests
-from collections import defaultdict
+import numpy as np
+from collections import Counter, defaultdict
+from functools import lru_cache
+from bisect import bisect_left
+from itertools import accumulate
 from typing import List, Dict, Tuple, Optional
 
+from wikidata import lookup_wikidata, is_error as is_wikidata_error
+
 # ============================================================================
 # IMPORTS
 # ============================================================================
@@ -39,18 +48,43 @@ except:
 
 try:
     from sentence_transformers import SentenceTransformer
-    from sklearn.metrics.pairwise import cosine_similarity
-    import numpy as np
     SEMANTIC_AVAILABLE = True
 except:
     SEMANTIC_AVAILABLE = False
 
+try:
+    import torch
+    CUDA_AVAILABLE = torch.cuda.is_available()
+except:
+    CUDA_AVAILABLE = False
+
+try:
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+    import onnxruntime
+    ONNX_AVAILABLE = True
+except:
+    ONNX_AVAILABLE = False
+
 try:
     from bertopic import BERTopic
     TOPIC_MODELING_AVAILABLE = True
 except:
     TOPIC_MODELING_AVAILABLE = False
 
+try:
+    # RAPIDS GPU replacements for BERTopic's default UMAP + HDBSCAN
+    from cuml.manifold import UMAP as cuUMAP
+    from cuml.cluster import HDBSCAN as cuHDBSCAN
+    CUML_AVAILABLE = True
+except:
+    CUML_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except:
+    ORJSON_AVAILABLE = False
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -60,8 +94,20 @@ USE_CONTEXT_ANALYSIS = True
 USE_SEMANTIC_EMBEDDINGS = True
 USE_TOPIC_MODELING = True
 SEMANTIC_THRESHOLD = 0.75
+SIMILARITY_BLOCK_SIZE = 512  # rows per tile in find_similar_pairs
+PATTERN_BLOCK_SIZE = 512  # anchor rows per tile in pairs_with_markers
 NUM_TOPICS = 5
+MIN_SEMANTIC_NODES = 4
+MIN_TOPIC_SENTENCES = 10
 CONFIDENCE_THRESHOLD = 0.7
+USE_WIKIDATA_PREFETCH = False  # Layer 5 stays lazy (verify on click) unless enabled
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", 32))
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", 64))
+SEMANTIC_MODEL_NAME = os.getenv("SEMANTIC_MODEL_NAME", "all-mpnet-base-v2")  # e.g. all-MiniLM-L6-v2 for ~5x smaller
+USE_ONNX_QUANTIZATION = os.getenv("USE_ONNX_QUANTIZATION", "1") == "1"  # 0 keeps the full fp32 model
+ONNX_QUANTIZATION_CONFIG = os.getenv("ONNX_QUANTIZATION_CONFIG", "avx512_vnni")  # avx512_vnni | avx512 | avx2 | arm64
+USE_TORCH_COMPILE = os.getenv("USE_TORCH_COMPILE", "0") == "1"
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".onnx_cache"))
 
 # ============================================================================
 # LOAD TRANSFORMER MODEL
@@ -85,9 +131,25 @@ except OSError:
 # LAYER 2: WORDNET TYPE HIERARCHY
 # ============================================================================
 
+# Hypernym names that signal each category (exact synset lemma names)
+PRODUCT_TERMS = frozenset({'artifact', 'vehicle', 'instrumentality', 'device', 'structure',
+                           'equipment', 'substance', 'drug', 'chemical', 'compound'})
+PERSON_TERMS = frozenset({'person', 'human', 'individual', 'organism', 'living_thing', 'causal_agent'})
+GPE_TERMS = frozenset({'location', 'region', 'district', 'geographical_area', 'point', 'place'})
+ORG_TERMS = frozenset({'organization', 'institution', 'enterprise', 'business', 'social_group'})
+
+HYPERNYM_CATEGORIES = (
+    ('PRODUCT', PRODUCT_TERMS, 0.8),
+    ('PERSON', PERSON_TERMS, 0.9),
+    ('GPE', GPE_TERMS, 0.85),
+    ('ORG', ORG_TERMS, 0.8)
+)
+
+@lru_cache(maxsize=4096)
 def get_wordnet_category(word):
     """
     Determine semantic category using WordNet type hierarchy
+    Memoized: recurring surface forms skip the synset/hypernym walk
     Returns: (category, confidence)
     """
     if not WORDNET_AVAILABLE:
@@ -112,31 +174,15 @@ def get_wordnet_category(word):
     
     for synset in synsets[:3]:
         hypernyms = synset.hypernyms()
-        all_hypernyms = set()
         
-        for h in hypernyms:
-            all_hypernyms.add(h.name())
-            all_hypernyms.update([hh.name() for hh in h.hypernyms()])
-        
-        hypernym_str = ' '.join(all_hypernyms).lower()
+        # Lemma part of hypernym names ('vehicle.n.01' -> 'vehicle'), two levels up
+        names = {h.name().split('.')[0] for h in hypernyms}
+        names.update(hh.name().split('.')[0] for h in hypernyms for hh in h.hypernyms())
         
         # Score different categories
-        if any(term in hypernym_str for term in ['artifact', 'vehicle', 'instrumentality', 
-                                                   'device', 'structure', 'equipment',
-                                                   'substance', 'drug', 'chemical', 'compound']):
-            category_scores['PRODUCT'] += 0.8
-        
-        if any(term in hypernym_str for term in ['person', 'human', 'individual', 
-                                                   'organism', 'living_thing', 'causal_agent']):
-            category_scores['PERSON'] += 0.9
-        
-        if any(term in hypernym_str for term in ['location', 'region', 'district',
-                                                   'geographical_area', 'point', 'place']):
-            category_scores['GPE'] += 0.85
-        
-        if any(term in hypernym_str for term in ['organization', 'institution',
-                                                   'enterprise', 'business', 'social_group']):
-            category_scores['ORG'] += 0.8
+        for category, terms, weight in HYPERNYM_CATEGORIES:
+            if not names.isdisjoint(terms):
+                category_scores[category] += weight
         
         # Check lexname for additional signals
         lexname = synset.lexname()
@@ -161,9 +207,43 @@ def get_wordnet_category(word):
 # LAYER 3: CONTEXT-BASED ANALYSIS
 # ============================================================================
 
-def analyze_entity_context(entity, doc):
+# Context indicators
+PRODUCT_INDICATORS = frozenset({
+    'vehicle', 'car', 'truck', 'system', 'device', 'tool', 'software',
+    'hardware', 'product', 'technology', 'machine', 'equipment', 'drug',
+    'medication', 'vaccine', 'treatment', 'compound', 'molecule', 'protein',
+    'developed', 'launched', 'announced', 'designed', 'built', 'manufactured',
+    'released', 'invented', 'created', 'produces'
+})
+
+PERSON_INDICATORS = frozenset({
+    'ceo', 'founder', 'president', 'director', 'scientist', 'researcher',
+    'doctor', 'professor', 'engineer', 'said', 'believes', 'stated',
+    'founded', 'leads', 'born', 'died', 'graduated', 'works', 'hired'
+})
+
+ORG_INDICATORS = frozenset({
+    'company', 'corporation', 'organization', 'institute', 'university',
+    'agency', 'department', 'business', 'firm', 'enterprise',
+    'headquartered', 'based', 'operates', 'acquired', 'merged', 'employs'
+})
+
+LOCATION_INDICATORS = frozenset({
+    'city', 'state', 'country', 'region', 'located', 'in', 'at',
+    'factory', 'plant', 'facility', 'headquarters', 'office', 'near'
+})
+
+CONTEXT_INDICATORS = (
+    ('PRODUCT', PRODUCT_INDICATORS),
+    ('PERSON', PERSON_INDICATORS),
+    ('ORG', ORG_INDICATORS),
+    ('GPE', LOCATION_INDICATORS)
+)
+
+def analyze_entity_context(entity, doc, lemma_lc=None):
     """
     Analyze surrounding words to determine entity type
+    lemma_lc: optional per-doc cache of lowercased lemmas (see main)
     Returns: (category, confidence, reason)
     """
     if not USE_CONTEXT_ANALYSIS:
@@ -171,46 +251,26 @@ def analyze_entity_context(entity, doc):
     
     start = max(0, entity.start - 5)
     end = min(len(doc), entity.end + 5)
-    context_tokens = doc[start:end]
-    
-    context_lemmas = [tok.lemma_.lower() for tok in context_tokens]
-    
-    # Context indicators
-    product_indicators = {
-        'vehicle', 'car', 'truck', 'system', 'device', 'tool', 'software',
-        'hardware', 'product', 'technology', 'machine', 'equipment', 'drug',
-        'medication', 'vaccine', 'treatment', 'compound', 'molecule', 'protein',
-        'developed', 'launched', 'announced', 'designed', 'built', 'manufactured',
-        'released', 'invented', 'created', 'produces'
-    }
-    
-    person_indicators = {
-        'ceo', 'founder', 'president', 'director', 'scientist', 'researcher',
-        'doctor', 'professor', 'engineer', 'said', 'believes', 'stated',
-        'founded', 'leads', 'born', 'died', 'graduated', 'works', 'hired'
-    }
     
-    org_indicators = {
-        'company', 'corporation', 'organization', 'institute', 'university',
-        'agency', 'department', 'business', 'firm', 'enterprise',
-        'headquartered', 'based', 'operates', 'acquired', 'merged', 'employs'
-    }
-    
-    location_indicators = {
-        'city', 'state', 'country', 'region', 'located', 'in', 'at',
-        'factory', 'plant', 'facility', 'headquarters', 'office', 'near'
-    }
+    if lemma_lc is not None:
+        context_lemmas = tuple(lemma_lc[start:end])
+    else:
+        context_lemmas = tuple(tok.lemma_.lower() for tok in doc[start:end])
     
+    return score_context_lemmas(context_lemmas)
+
+@lru_cache(maxsize=4096)
+def score_context_lemmas(context_lemmas):
+    """
+    Score a context window (tuple of lowercased lemmas) against the indicator sets
+    Memoized: repeated mentions in the same phrasing reuse the result
+    Returns: (category, confidence, reason)
+    """
     # Count matches and collect reasons
     scores = {}
     reasons = {}
     
-    for category, indicators in [
-        ('PRODUCT', product_indicators),
-        ('PERSON', person_indicators),
-        ('ORG', org_indicators),
-        ('GPE', location_indicators)
-    ]:
+    for category, indicators in CONTEXT_INDICATORS:
         matched = [w for w in context_lemmas if w in indicators]
         scores[category] = len(matched)
         if matched:
@@ -229,7 +289,7 @@ def analyze_entity_context(entity, doc):
 # LAYER 5: INTELLIGENT MULTI-LAYER CLASSIFICATION
 # ============================================================================
 
-def classify_entity_intelligent(entity, label, doc):
+def classify_entity_intelligent(entity, label, doc, lemma_lc=None):
     """
     Multi-layer classification with reasoning
     Returns: (final_type, confidence, reasoning_chain)
@@ -255,7 +315,7 @@ def classify_entity_intelligent(entity, label, doc):
                 confidence = max(confidence, wn_conf)
     
     # Layer 3: Context analysis
-    ctx_type, ctx_conf, ctx_reason = analyze_entity_context(entity, doc)
+    ctx_type, ctx_conf, ctx_reason = analyze_entity_context(entity, doc, lemma_lc)
     if ctx_type and ctx_conf > 0.4:
         if ctx_type != base_type:
             reasoning_chain.append(f"Context override: {base_type} → {ctx_type} (conf: {ctx_conf:.2f}, {ctx_reason})")
@@ -274,65 +334,46 @@ def classify_entity_intelligent(entity, label, doc):
 # WIKIDATA LAZY LOOKUP (BACKEND ENDPOINT)
 # ============================================================================
 
+WIKIDATA_CACHE_SIZE = 2048
+
+_wikidata_cache = {}  # entity text -> {"type", "confidence", "reason"}, LRU order
+
+def query_wikidata_batch(entity_texts):
+    """
+    Verify several entities at once through the shared wikidata module
+    (batched searches + wbgetentities claims), memoized in process for the worker's lifetime
+    Returns: {entity_text: {"type", "confidence", "reason"}}
+    """
+    results = {}
+    for text in dict.fromkeys(entity_texts):
+        if text in _wikidata_cache:
+            results[text] = _wikidata_cache.pop(text)
+            _wikidata_cache[text] = results[text]  # mark as most recently used
+    
+    fresh = lookup_wikidata([text for text in dict.fromkeys(entity_texts) if text not in results])
+    results.update(fresh)
+    
+    # Cache definitive answers only; network errors are retried on the next call
+    for text, result in fresh.items():
+        if not is_wikidata_error(result):
+            if len(_wikidata_cache) >= WIKIDATA_CACHE_SIZE:
+                _wikidata_cache.pop(next(iter(_wikidata_cache)))
+            _wikidata_cache[text] = result
+    
+    return results
+
 def query_wikidata_for_entity(entity_text):
     """
     Query WikiData for entity validation
     This will be called via API endpoint when user clicks "Verify"
     """
-    try:
-        # Search WikiData
-        search_url = "https://www.wikidata.org/w/api.php"
-        params = {
-            'action': 'wbsearchentities',
-            'search': entity_text,
-            'language': 'en',
-            'format': 'json',
-            'limit': 1
-        }
-        
-        response = requests.get(search_url, params=params, timeout=3)
-        data = response.json()
-        
-        if not data.get('search'):
-            return None, 0, "Not found in WikiData"
-        
-        entity_id = data['search'][0]['id']
-        label = data['search'][0]['label']
-        description = data['search'][0].get('description', '')
-        
-        # Get entity data
-        entity_url = f"https://www.wikidata.org/wiki/Special:EntityData/{entity_id}.json"
-        response = requests.get(entity_url, timeout=3)
-        entity_data = response.json()
-        
-        claims = entity_data['entities'][entity_id].get('claims', {})
-        
-        # Determine type from instance_of (P31)
-        if 'P31' in claims:
-            instance_values = []
-            for claim in claims['P31']:
-                if 'datavalue' in claim['mainsnak']:
-                    instance_values.append(claim['mainsnak']['datavalue']['value']['id'])
-            
-            # Map WikiData classes
-            if 'Q5' in instance_values:
-                return 'PERSON', 0.97, f"WikiData: {label} ({description})"
-            elif any(v in ['Q4830453', 'Q43229', 'Q783794'] for v in instance_values):
-                return 'ORG', 0.97, f"WikiData: {label} ({description})"
-            elif any(v in ['Q515', 'Q6256', 'Q618123'] for v in instance_values):
-                return 'GPE', 0.97, f"WikiData: {label} ({description})"
-            elif any(v in ['Q2424752', 'Q478798'] for v in instance_values):
-                return 'PRODUCT', 0.97, f"WikiData: {label} ({description})"
-        
-        return None, 0, f"WikiData found but unclear type: {label} ({description})"
-    
-    except Exception as e:
-        return None, 0, f"WikiData error: {str(e)}"
+    return query_wikidata_batch([entity_text])[entity_text]
 
 # ============================================================================
 # ENTITY DEDUPLICATION
 # ============================================================================
 
+@lru_cache(maxsize=4096)
 def normalize_entity_text(text):
     text = text.lower().strip()
     text = re.sub(r'\s+', ' ', text)
@@ -340,50 +381,54 @@ def normalize_entity_text(text):
     return text
 
 def deduplicate_entities(entities):
-    seen = {}
-    deduplicated = []
+    best = {}
     
     for ent in entities:
         norm_text = normalize_entity_text(ent['label'])
         
-        if norm_text not in seen:
-            seen[norm_text] = ent
-            deduplicated.append(ent)
-        else:
-            if ent.get('confidence', 0) > seen[norm_text].get('confidence', 0):
-                seen[norm_text] = ent
-                deduplicated = [e for e in deduplicated if normalize_entity_text(e['label']) != norm_text]
-                deduplicated.append(ent)
+        if norm_text not in best:
+            best[norm_text] = ent
+        elif ent.get('confidence', 0) > best[norm_text].get('confidence', 0):
+            # Re-insert so the replacement moves to the end, as before
+            del best[norm_text]
+            best[norm_text] = ent
     
-    return deduplicated
+    return list(best.values())
 
 # ============================================================================
 # MONEY EXTRACTION
 # ============================================================================
 
+# All currency forms in one alternation, compiled once: a single pass over the text
+_MONEY_RE = re.compile(
+    r'\$[\d,]+(?:\.\d+)?\s*(?:million|billion|trillion|M|B|T)?'
+    r'|[\d,]+(?:\.\d+)?\s*(?:dollars|USD|euros|EUR|pounds|GBP|rupees|INR)'
+    r'|€[\d,]+(?:\.\d+)?'
+    r'|£[\d,]+(?:\.\d+)?'
+    r'|₹[\d,]+(?:\.\d+)?',
+    re.IGNORECASE
+)
+
 def extract_money_entities(text, doc):
     money_entities = []
     
-    patterns = [
-        r'\$[\d,]+(?:\.\d+)?\s*(?:million|billion|trillion|M|B|T)?',
-        r'[\d,]+(?:\.\d+)?\s*(?:dollars|USD|euros|EUR|pounds|GBP|rupees|INR)',
-        r'€[\d,]+(?:\.\d+)?',
-        r'£[\d,]+(?:\.\d+)?',
-        r'₹[\d,]+(?:\.\d+)?'
-    ]
-    
-    for pattern in patterns:
-        for match in re.finditer(pattern, text, re.IGNORECASE):
-            money_text = match.group(0).strip()
-            
-            already_exists = False
-            for ent in doc.ents:
-                if money_text in ent.text or ent.text in money_text:
-                    already_exists = True
-                    break
-            
-            if not already_exists:
-                money_entities.append(money_text)
+    # Entity char spans sorted by start, with a running max of ends: the entities
+    # that can overlap [m_start, m_end) are those starting before m_end, and one of
+    # them overlaps iff the largest end among them is past m_start
+    spans = sorted((ent.start_char, ent.end_char) for ent in doc.ents)
+    ent_starts = [start for start, _ in spans]
+    max_ends = list(accumulate((end for _, end in spans), max))
+    
+    for match in _MONEY_RE.finditer(text):
+        money_text = match.group(0).strip()
+        m_start = match.start()
+        m_end = m_start + len(money_text)
+        
+        k = bisect_left(ent_starts, m_end)
+        already_exists = k > 0 and max_ends[k - 1] > m_start
+        
+        if not already_exists:
+            money_entities.append(money_text)
     
     return money_entities
 
@@ -391,18 +436,25 @@ def extract_money_entities(text, doc):
 # UTILITY FUNCTIONS
 # ============================================================================
 
+# Control characters except \t, \n, \r (deletion table for str.translate)
+_CTL_TABLE = dict.fromkeys(list(range(0x00, 0x09)) + [0x0B, 0x0C] + list(range(0x0E, 0x20)) + [0x7F])
+
 def sanitize_text(text):
     if not text:
         return ""
-    clean_text = text.encode('utf-8', errors='ignore').decode('utf-8', errors='ignore')
-    clean_text = re.sub(r'[\x00-\x08\x0B-\x0C\x0E-\x1F\x7F]', '', clean_text)
-    return clean_text.strip()
+    if isinstance(text, bytes):
+        text = text.decode('utf-8', errors='ignore')
+    return text.translate(_CTL_TABLE).strip()
 
-def find_entity_containing(token, entities):
-    for ent in entities:
-        if ent.start <= token.i < ent.end:
-            return ent
-    return None
+def build_token_entity_index(doc, entities):
+    """
+    Dense token index -> entity index map (-1 where no entity)
+    Filled in reverse so the first entity covering a token wins
+    """
+    tok2ent = np.full(len(doc), -1, dtype=np.int32)
+    for i in range(len(entities) - 1, -1, -1):
+        tok2ent[entities[i].start:entities[i].end] = i
+    return tok2ent
 
 def get_entity_context(doc, entity, window=20):
     start = max(0, entity.start - window)
@@ -413,9 +465,25 @@ def get_entity_context(doc, entity, window=20):
 # RELATIONSHIP EXTRACTION
 # ============================================================================
 
-def extract_dependency_relationships(doc, entities, node_ids):
+def add_unique_edge(edges, seen, edge):
+    """
+    Append edge unless its (from, to, label) key was already emitted by any extractor
+    Edges with an unresolved endpoint are dropped
+    """
+    if not edge["from"] or not edge["to"]:
+        return
+    key = (edge["from"], edge["to"], edge["label"])
+    if key in seen:
+        return
+    seen.add(key)
+    edges.append(edge)
+
+def extract_dependency_relationships(doc, entities, node_ids, seen=None):
     edges = []
+    seen = set() if seen is None else seen
     relationship_map = defaultdict(list)
+    entities = list(entities)
+    tok2ent = build_token_entity_index(doc, entities)
     
     for token in doc:
         if token.pos_ == "VERB":
@@ -424,10 +492,15 @@ def extract_dependency_relationships(doc, entities, node_ids):
             
             for subj in subjects:
                 for obj in objects:
-                    subj_ent = find_entity_containing(subj, entities)
-                    obj_ent = find_entity_containing(obj, entities)
+                    subj_idx = tok2ent[subj.i]
+                    obj_idx = tok2ent[obj.i]
+                    if subj_idx < 0 or obj_idx < 0:
+                        continue
                     
-                    if subj_ent and obj_ent and subj_ent.text != obj_ent.text:
+                    subj_ent = entities[subj_idx]
+                    obj_ent = entities[obj_idx]
+                    
+                    if subj_ent.text != obj_ent.text:
                         verb_label = token.lemma_.lower()
                         # Get full sentence context
                         sent_text = token.sent.text
@@ -435,11 +508,11 @@ def extract_dependency_relationships(doc, entities, node_ids):
     
     for (from_ent, to_ent), verb_data in relationship_map.items():
         if from_ent in node_ids and to_ent in node_ids:
-            verbs = [v[0] for v in verb_data]
-            label = max(set(verbs), key=verbs.count) if verbs else "related"
-            context = verb_data[0][1] if verb_data else ""
+            # Entries are only created by append, so verb_data is never empty
+            (label, _), = Counter(verb for verb, _ in verb_data).most_common(1)
+            _, context = verb_data[0]
             
-            edges.append({
+            add_unique_edge(edges, seen, {
                 "from": node_ids[from_ent],
                 "to": node_ids[to_ent],
                 "label": label,
@@ -450,86 +523,120 @@ def extract_dependency_relationships(doc, entities, node_ids):
     
     return edges
 
-def extract_pattern_relationships(doc, entities, node_ids):
+# Pattern cue words (matched case-insensitively; multi-word cues are allowed)
+LOCATION_PREPS = frozenset(["in", "at", "from", "near", "based", "located", "headquartered"])
+WORK_INDICATORS = frozenset(["works", "work", "employed", "ceo", "founded", "created", "leads", "serves"])
+DEV_INDICATORS = frozenset(["developed", "created", "built", "designed", "launched", "announced"])
+FOUNDED_CUES = frozenset(["founded", "created"])
+LEADS_CUES = frozenset(["ceo", "leads"])
+
+CUE_VOCABULARIES = {
+    "LOCATION": LOCATION_PREPS,
+    "WORK": WORK_INDICATORS,
+    "DEV": DEV_INDICATORS,
+}
+
+# One matcher over all cue vocabularies: a single pass per doc finds every cue hit
+cue_matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+for _key, _words in CUE_VOCABULARIES.items():
+    cue_matcher.add(_key, [nlp.make_doc(w) for w in sorted(_words)])
+
+def flag_cue_tokens(doc):
+    """
+    Per-vocabulary boolean token flags from one PhraseMatcher pass
+    Returns: {vocabulary key: bool array over doc tokens}
+    """
+    flags = {key: np.zeros(len(doc), dtype=bool) for key in CUE_VOCABULARIES}
+    for match_id, start, end in cue_matcher(doc):
+        flags[nlp.vocab.strings[match_id]][start:end] = True
+    return flags
+
+def markers_between(doc, marker_flags, starts, ends, i, j):
+    """Marker words found in the token gap between entities i and j"""
+    lo, hi = min(ends[i], ends[j]), max(starts[i], starts[j])
+    if lo >= hi or not marker_flags[lo:hi].any():
+        return []
+    return [doc[k].lower_ for k in lo + np.flatnonzero(marker_flags[lo:hi])]
+
+def pairs_with_markers(marker_flags, starts, ends, anchors, partners):
+    """
+    All (anchor, partner) entity index pairs with at least one marker token between them
+    Prefix sums of the flags give every pair's marker count in one broadcast, no Python pair loop
+    Anchors are processed in PATTERN_BLOCK_SIZE tiles, so memory stays O(block * partners)
+    Returns: (n, 2) int array in anchor-major order
+    """
+    counts = np.concatenate(([0], np.cumsum(marker_flags, dtype=np.int64)))
+    partner_starts = starts[partners][None, :]
+    partner_ends = ends[partners][None, :]
+    blocks = [np.empty((0, 2), dtype=np.int64)]
+    
+    for a0 in range(0, len(anchors), PATTERN_BLOCK_SIZE):
+        block = anchors[a0:a0 + PATTERN_BLOCK_SIZE]
+        lo = np.minimum(ends[block][:, None], partner_ends)
+        hi = np.maximum(starts[block][:, None], partner_starts)
+        hit = (lo < hi) & (counts[hi] > counts[lo])
+        rows, cols = np.nonzero(hit)
+        blocks.append(np.column_stack((block[rows], partners[cols])))
+    
+    return np.concatenate(blocks)
+
+def work_relation_label(matched):
+    """Refine an ORG-PERSON work cue into founded / leads / works_at"""
+    if any(w in FOUNDED_CUES for w in matched):
+        return "founded"
+    if any(w in LEADS_CUES for w in matched):
+        return "leads"
+    return "works_at"
+
+# (anchor labels, partner labels, cue vocabulary, edge label or labeler), applied in order
+PATTERN_RULES = (
+    (("GPE", "LOC", "FAC"), ("PERSON", "ORG"), "LOCATION", "located_in"),
+    (("ORG",), ("PERSON",), "WORK", work_relation_label),
+    (("PRODUCT", "WORK_OF_ART"), ("ORG", "PERSON"), "DEV", "developed"),
+)
+
+def extract_pattern_relationships(doc, entities, node_ids, seen=None):
     edges = []
+    seen = set() if seen is None else seen
+    entities = list(entities)
+    if not entities:
+        return edges
+    
+    # Structure-of-arrays view of entity spans;
+    # cue words are flagged once per doc so each pair only slices a bool array
+    starts = np.fromiter((e.start for e in entities), dtype=np.int64, count=len(entities))
+    ends = np.fromiter((e.end for e in entities), dtype=np.int64, count=len(entities))
+    cue_flags = flag_cue_tokens(doc)
+    
+    # Bucket entities by label so each rule only visits its relevant label pairs
+    by_label = defaultdict(list)
+    for k, e in enumerate(entities):
+        by_label[e.label_].append(k)
+    
+    for anchor_labels, partner_labels, cue_key, edge_label in PATTERN_RULES:
+        anchors = np.array(sorted(k for lab in anchor_labels for k in by_label.get(lab, ())), dtype=np.int64)
+        partners = np.array(sorted(k for lab in partner_labels for k in by_label.get(lab, ())), dtype=np.int64)
+        if not len(anchors) or not len(partners):
+            continue
+        
+        is_cue = cue_flags[cue_key]
+        if not is_cue.any():
+            continue
+        
+        # Only matching pairs come back to Python to be turned into edges
+        for i, j in pairs_with_markers(is_cue, starts, ends, anchors, partners).tolist():
+            matched = markers_between(doc, is_cue, starts, ends, i, j)
+            ent, other_ent = entities[i], entities[j]
+            sent_text = ent.sent.text if hasattr(ent, 'sent') else ""
+            add_unique_edge(edges, seen, {
+                "from": node_ids.get(other_ent.text),
+                "to": node_ids.get(ent.text),
+                "label": edge_label(matched) if callable(edge_label) else edge_label,
+                "source": "pattern",
+                "context": sent_text,
+                "reason": f"Pattern detected: {', '.join(matched)}"
+            })
     
-    # Location relationships
-    for ent in entities:
-        if ent.label_ in ("GPE", "LOC", "FAC"):
-            for other_ent in entities:
-                if other_ent.label_ in ("PERSON", "ORG") and other_ent != ent:
-                    start = min(ent.end, other_ent.end)
-                    end = max(ent.start, other_ent.start)
-                    between_tokens = doc[start:end]
-                    location_preps = ["in", "at", "from", "near", "based", "located", "headquartered"]
-                    
-                    matched = [tok.text.lower() for tok in between_tokens if tok.text.lower() in location_preps]
-                    
-                    if matched:
-                        sent_text = ent.sent.text if hasattr(ent, 'sent') else ""
-                        edges.append({
-                            "from": node_ids.get(other_ent.text),
-                            "to": node_ids.get(ent.text),
-                            "label": "located_in",
-                            "source": "pattern",
-                            "context": sent_text,
-                            "reason": f"Pattern detected: {', '.join(matched)}"
-                        })
-    
-    # Organizational relationships
-    for ent in entities:
-        if ent.label_ == "ORG":
-            for other_ent in entities:
-                if other_ent.label_ == "PERSON" and other_ent != ent:
-                    start = min(ent.end, other_ent.end)
-                    end = max(ent.start, other_ent.start)
-                    between_tokens = doc[start:end]
-                    work_indicators = ["works", "work", "employed", "ceo", "founded", "created", "leads", "serves"]
-                    
-                    matched = [tok.text.lower() for tok in between_tokens if tok.text.lower() in work_indicators]
-                    
-                    if matched:
-                        if any(w in ["founded", "created"] for w in matched):
-                            label = "founded"
-                        elif any(w in ["ceo", "leads"] for w in matched):
-                            label = "leads"
-                        else:
-                            label = "works_at"
-                        
-                        sent_text = ent.sent.text if hasattr(ent, 'sent') else ""
-                        edges.append({
-                            "from": node_ids.get(other_ent.text),
-                            "to": node_ids.get(ent.text),
-                            "label": label,
-                            "source": "pattern",
-                            "context": sent_text,
-                            "reason": f"Pattern detected: {', '.join(matched)}"
-                        })
-    
-    # Product development
-    for ent in entities:
-        if ent.label_ in ["PRODUCT", "WORK_OF_ART"]:
-            for other_ent in entities:
-                if other_ent.label_ in ["ORG", "PERSON"] and other_ent != ent:
-                    start = min(ent.end, other_ent.end)
-                    end = max(ent.start, other_ent.start)
-                    between_tokens = doc[start:end]
-                    dev_indicators = ["developed", "created", "built", "designed", "launched", "announced"]
-                    
-                    matched = [tok.text.lower() for tok in between_tokens if tok.text.lower() in dev_indicators]
-                    
-                    if matched:
-                        sent_text = ent.sent.text if hasattr(ent, 'sent') else ""
-                        edges.append({
-                            "from": node_ids.get(other_ent.text),
-                            "to": node_ids.get(ent.text),
-                            "label": "developed",
-                            "source": "pattern",
-                            "context": sent_text,
-                            "reason": f"Pattern detected: {', '.join(matched)}"
-                        })
-    
-    edges = [e for e in edges if e["from"] and e["to"]]
     return edges
 
 # ============================================================================
@@ -538,41 +645,128 @@ def extract_pattern_relationships(doc, entities, node_ids):
 
 _semantic_model_cache = None
 
+def load_quantized_onnx_model(model_name):
+    """
+    Load an INT8 (dynamically quantized) ONNX export of the sentence transformer.
+    The quantized artifact is exported once and cached under ONNX_CACHE_DIR.
+    The export runs in a scratch directory and the quantized file is moved into place last,
+    so a process killed mid-export leaves no truncated model behind and the next start retries.
+    """
+    model_dir = os.path.join(ONNX_CACHE_DIR, model_name.replace('/', '_'))
+    file_suffix = f"int8_{ONNX_QUANTIZATION_CONFIG}"
+    file_name = f"onnx/model_{file_suffix}.onnx"
+    model_path = os.path.join(model_dir, file_name)
+
+    if not os.path.exists(model_path):
+        print(f"🔄 Exporting INT8 ONNX model ({ONNX_QUANTIZATION_CONFIG})...", file=sys.stderr)
+        os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+        for stale in os.listdir(ONNX_CACHE_DIR):  # scratch dirs of exports killed before cleanup
+            if stale.startswith(".export-"):
+                shutil.rmtree(os.path.join(ONNX_CACHE_DIR, stale), ignore_errors=True)
+        export_dir = tempfile.mkdtemp(prefix=".export-", dir=ONNX_CACHE_DIR)
+        try:
+            onnx_model = SentenceTransformer(model_name, backend="onnx")
+            onnx_model.save(export_dir)
+            export_dynamic_quantized_onnx_model(onnx_model, ONNX_QUANTIZATION_CONFIG, export_dir, file_suffix=file_suffix)
+            shutil.copytree(export_dir, model_dir, dirs_exist_ok=True,
+                            ignore=shutil.ignore_patterns(os.path.basename(file_name)))
+            os.replace(os.path.join(export_dir, file_name), model_path)  # atomic: same filesystem
+        finally:
+            shutil.rmtree(export_dir, ignore_errors=True)
+
+    try:
+        return SentenceTransformer(model_dir, backend="onnx", model_kwargs={"file_name": file_name})
+    except Exception:
+        # Unreadable artifact (e.g. left by an older, non-atomic export): drop it so the next start re-exports
+        os.remove(model_path)
+        raise
+
+def compile_semantic_model(model):
+    """
+    Wrap the underlying HF encoder with torch.compile (kernel fusion, CUDA graphs)
+    Compilation cost is paid on the first batch, so this only pays off in long-lived processes
+    """
+    try:
+        encoder = model[0]
+        encoder.auto_model = torch.compile(encoder.auto_model, mode="reduce-overhead", dynamic=True)
+        print("✅ Sentence transformer compiled (torch.compile)", file=sys.stderr)
+    except Exception as e:
+        print(f"⚠️ torch.compile unavailable: {str(e)}", file=sys.stderr)
+
 def get_semantic_model():
     global _semantic_model_cache
-    
+
     if _semantic_model_cache is None and SEMANTIC_AVAILABLE:
         print("📥 Loading sentence transformer...", file=sys.stderr)
         try:
-            _semantic_model_cache = SentenceTransformer('all-mpnet-base-v2')
-            print("✅ Sentence transformer loaded", file=sys.stderr)
+            if CUDA_AVAILABLE:
+                # FP16 on GPU beats INT8 ONNX on CPU; ONNX path is CPU-only
+                _semantic_model_cache = SentenceTransformer(SEMANTIC_MODEL_NAME, device="cuda")
+                _semantic_model_cache.half()
+                print("✅ Sentence transformer loaded (CUDA FP16)", file=sys.stderr)
+            elif USE_ONNX_QUANTIZATION and ONNX_AVAILABLE:
+                try:
+                    _semantic_model_cache = load_quantized_onnx_model(SEMANTIC_MODEL_NAME)
+                    print("✅ Sentence transformer loaded (ONNX INT8)", file=sys.stderr)
+                except Exception as e:
+                    print(f"⚠️ ONNX INT8 unavailable, using FP32: {str(e)}", file=sys.stderr)
+
+            if _semantic_model_cache is None:
+                _semantic_model_cache = SentenceTransformer(SEMANTIC_MODEL_NAME)
+                print("✅ Sentence transformer loaded", file=sys.stderr)
+            
+            if USE_TORCH_COMPILE and getattr(_semantic_model_cache, "backend", "torch") == "torch":
+                compile_semantic_model(_semantic_model_cache)
         except Exception as e:
             print(f"❌ Failed: {str(e)}", file=sys.stderr)
             return None
-    
+
     return _semantic_model_cache
 
-def extract_semantic_relationships(doc, nodes, node_ids):
-    if not USE_SEMANTIC_EMBEDDINGS or not SEMANTIC_AVAILABLE:
+def encode_texts(model, texts):
+    """
+    Batched encode shared by the semantic and topic layers
+    Returns L2-normalized float32 numpy embeddings
+    """
+    embeddings = model.encode(texts, batch_size=ENCODE_BATCH_SIZE, show_progress_bar=False,
+                              convert_to_numpy=True, normalize_embeddings=True)
+    return embeddings.astype(np.float32, copy=False)  # FP16 (CUDA) output back to fp32
+
+def find_similar_pairs(embeddings, threshold):
+    """
+    Find all (i, j, similarity) pairs with i < j above threshold.
+    Expects L2-normalized embeddings, so cosine similarity is a single matmul.
+    Rows are processed in SIMILARITY_BLOCK_SIZE tiles against the remaining columns,
+    so memory stays O(N * block) instead of a full N x N matrix.
+    """
+    pairs = []
+    n = len(embeddings)
+    
+    for i0 in range(0, n, SIMILARITY_BLOCK_SIZE):
+        block = embeddings[i0:i0 + SIMILARITY_BLOCK_SIZE]
+        sim = block @ embeddings[i0:].T
+        
+        # Keep the strict upper triangle: local column c is global column i0 + c
+        mask = np.triu(sim > threshold, k=1)
+        for r, c in np.argwhere(mask):
+            pairs.append((i0 + int(r), i0 + int(c), float(sim[r, c])))
+    
+    return pairs
+
+def extract_semantic_relationships(doc, nodes, ent_by_id, seen=None):
+    # Too few candidate pairs to be worth loading the sentence transformer
+    if not USE_SEMANTIC_EMBEDDINGS or not SEMANTIC_AVAILABLE or len(nodes) < MIN_SEMANTIC_NODES:
         return []
     
     edges = []
+    seen = set() if seen is None else seen
     
     try:
-        model = get_semantic_model()
-        if model is None:
-            return []
-        
         entity_contexts = []
         entities_list = []
         
         for node in nodes:
-            label = node["label"]
-            entity = None
-            for ent in doc.ents:
-                if ent.text == label:
-                    entity = ent
-                    break
+            entity = ent_by_id.get(node["id"])
             
             if entity:
                 context = get_entity_context(doc, entity, window=20)
@@ -582,22 +776,22 @@ def extract_semantic_relationships(doc, nodes, node_ids):
         if len(entities_list) < 2:
             return []
         
-        embeddings = model.encode(entity_contexts, show_progress_bar=False)
+        model = get_semantic_model()
+        if model is None:
+            return []
         
-        for i in range(len(entities_list)):
-            for j in range(i + 1, len(entities_list)):
-                similarity = cosine_similarity([embeddings[i]], [embeddings[j]])[0][0]
-                
-                if similarity > SEMANTIC_THRESHOLD:
-                    edges.append({
-                        "from": entities_list[i]["id"],
-                        "to": entities_list[j]["id"],
-                        "label": "semantically_related",
-                        "source": "semantic",
-                        "weight": float(similarity),
-                        "context": f"{entities_list[i]['label']} and {entities_list[j]['label']} appear in similar contexts",
-                        "reason": f"Semantic similarity: {similarity:.2f}"
-                    })
+        embeddings = encode_texts(model, entity_contexts)
+        
+        for i, j, similarity in find_similar_pairs(embeddings, SEMANTIC_THRESHOLD):
+            add_unique_edge(edges, seen, {
+                "from": entities_list[i]["id"],
+                "to": entities_list[j]["id"],
+                "label": "semantically_related",
+                "source": "semantic",
+                "weight": similarity,
+                "context": f"{entities_list[i]['label']} and {entities_list[j]['label']} appear in similar contexts",
+                "reason": f"Semantic similarity: {similarity:.2f}"
+            })
         
         print(f"✅ Level 3: Found {len(edges)} semantic relationships", file=sys.stderr)
     
@@ -606,31 +800,63 @@ def extract_semantic_relationships(doc, nodes, node_ids):
     
     return edges
 
-def extract_topics(text, nodes, counter):
-    if not USE_TOPIC_MODELING or not TOPIC_MODELING_AVAILABLE or len(text) < 100:
+_sentence_embedding_cache = {}
+SENTENCE_CACHE_SIZE = 32  # bounded: in --serve mode the process outlives many texts
+
+def encode_sentences(model, sentences, text):
+    """
+    Encode topic-modeling sentences once and hand them to BERTopic precomputed
+    Cached per source text so repeated extractions of the same text skip encoding
+    (keyed on the text itself: a hash collision would silently return another text's embeddings)
+    """
+    if text not in _sentence_embedding_cache:
+        if len(_sentence_embedding_cache) >= SENTENCE_CACHE_SIZE:
+            # Evict the oldest entry (dicts keep insertion order)
+            _sentence_embedding_cache.pop(next(iter(_sentence_embedding_cache)))
+        _sentence_embedding_cache[text] = encode_texts(model, sentences)
+    return _sentence_embedding_cache[text]
+
+def extract_topics(doc, nodes, counter, seen=None):
+    """
+    Detect themes with BERTopic over the sentences of an already-parsed doc
+    (reuses the main pass instead of running the pipeline a second time)
+    """
+    if not USE_TOPIC_MODELING or not TOPIC_MODELING_AVAILABLE or len(doc.text) < 100:
         return [], [], counter
     
     theme_nodes = []
     theme_edges = []
+    seen = set() if seen is None else seen
     
     try:
+        sentences = [s.text for s in doc.sents if len(s.text.strip()) > 20]
+        
+        # Check before touching the model: BERTopic needs a reasonable corpus
+        if len(sentences) < MIN_TOPIC_SENTENCES:
+            return [], [], counter
+        
         sentence_model = get_semantic_model()
         if sentence_model is None:
             return [], [], counter
         
+        # Dimensionality reduction + clustering on GPU when RAPIDS is installed
+        gpu_models = {}
+        if CUML_AVAILABLE and CUDA_AVAILABLE:
+            gpu_models = {
+                "umap_model": cuUMAP(n_components=5, n_neighbors=15, min_dist=0.0),
+                "hdbscan_model": cuHDBSCAN(min_samples=10, gen_min_span_tree=True, prediction_data=True)
+            }
+        
         topic_model = BERTopic(
             embedding_model=sentence_model,
             nr_topics=NUM_TOPICS,
             verbose=False,
-            calculate_probabilities=False
+            calculate_probabilities=False,
+            **gpu_models
         )
         
-        sentences = [sent.text for sent in nlp(text).sents if len(sent.text.strip()) > 20]
-        
-        if len(sentences) < 5:
-            return [], [], counter
-        
-        topics, _ = topic_model.fit_transform(sentences)
+        embeddings = encode_sentences(sentence_model, sentences, doc.text)
+        topics, _ = topic_model.fit_transform(sentences, embeddings=embeddings)
         topic_info = topic_model.get_topic_info()
         
         for idx, row in topic_info.iterrows():
@@ -660,7 +886,7 @@ def extract_topics(text, nodes, counter):
                 entity_label = node["label"].lower()
                 
                 if any(keyword.lower() in entity_label or entity_label in keyword.lower() for keyword in keywords):
-                    theme_edges.append({
+                    add_unique_edge(theme_edges, seen, {
                         "from": node["id"],
                         "to": counter,
                         "label": "relates_to_theme",
@@ -682,126 +908,217 @@ def extract_topics(text, nodes, counter):
 # MAIN EXTRACTION PIPELINE
 # ============================================================================
 
-def main():
-    try:
-        raw_text = sys.stdin.read()
-        
-        if not raw_text or not raw_text.strip():
-            print(json.dumps({"nodes": [], "edges": [], "metadata": {}}))
-            sys.exit(0)
-        
-        clean_text = sanitize_text(raw_text)
-        
-        if not clean_text or not clean_text.strip():
-            print(json.dumps({"nodes": [], "edges": [], "metadata": {"error": "Text sanitization failed"}}))
-            sys.exit(0)
-        
-        print(f"✅ Text sanitized: {len(raw_text)} → {len(clean_text)} chars", file=sys.stderr)
+def prepare_text(raw_text):
+    """
+    Sanitize raw input
+    Returns: (clean_text, early_result) - early_result is set when there is nothing to parse
+    """
+    if not raw_text or not raw_text.strip():
+        return None, {"nodes": [], "edges": [], "metadata": {}}
+    
+    clean_text = sanitize_text(raw_text)
+    
+    if not clean_text or not clean_text.strip():
+        return None, {"nodes": [], "edges": [], "metadata": {"error": "Text sanitization failed"}}
+    
+    print(f"✅ Text sanitized: {len(raw_text)} → {len(clean_text)} chars", file=sys.stderr)
+    return clean_text, None
+
+def build_graph(doc, clean_text):
+    """
+    Run every extraction layer over a parsed doc
+    Returns: {"nodes", "edges", "metadata"}
+    """
+    # Extract entities with multi-layer classification
+    nodes = []
+    node_ids = {}
+    ent_by_id = {}
+    counter = 1
+    low_confidence_entities = []
+    
+    print("🔄 Multi-layer entity classification...", file=sys.stderr)
+    
+    # Lowercased lemmas computed once per doc, sliced per entity
+    lemma_lc = [tok.lemma_.lower() for tok in doc]
+    
+    for ent in doc.ents:
+        final_type, confidence, reasoning = classify_entity_intelligent(ent, ent.label_, doc, lemma_lc)
         
-        doc = nlp(clean_text)
+        node = {
+            "id": counter,
+            "label": ent.text,
+            "type": final_type,
+            "confidence": confidence,
+            "reasoning": reasoning,
+            "can_verify": confidence < 0.85  # Flag for WikiData verification
+        }
         
-        # Extract entities with multi-layer classification
-        nodes = []
-        node_ids = {}
-        counter = 1
-        low_confidence_entities = []
+        if confidence < CONFIDENCE_THRESHOLD:
+            low_confidence_entities.append(ent.text)
         
-        print("🔄 Multi-layer entity classification...", file=sys.stderr)
+        nodes.append(node)
+        node_ids[ent.text] = counter
+        ent_by_id[counter] = ent
+        counter += 1
+    
+    # Extract MONEY
+    money_entities = extract_money_entities(clean_text, doc)
+    for money_text in money_entities:
+        nodes.append({
+            "id": counter,
+            "label": money_text,
+            "type": "MONEY",
+            "confidence": 0.95,
+            "reasoning": ["Regex pattern matched currency"],
+            "can_verify": False
+        })
+        node_ids[money_text] = counter
+        counter += 1
+    
+    # Deduplicate
+    nodes = deduplicate_entities(nodes)
+    node_ids = {node["label"]: node["id"] for node in nodes}
+    
+    print(f"✅ Extracted {len(nodes)} entities", file=sys.stderr)
+    if low_confidence_entities:
+        print(f"⚠️ Low confidence: {', '.join(low_confidence_entities[:5])}", file=sys.stderr)
+    
+    # Optional eager WikiData pass over every verifiable entity, in one batch
+    if USE_WIKIDATA_PREFETCH:
+        verify_nodes = [node for node in nodes if node.get("can_verify")]
+        verified = query_wikidata_batch([node["label"] for node in verify_nodes])
+        for node in verify_nodes:
+            result = verified[node["label"]]
+            if result["type"]:
+                node["type"] = result["type"]
+                node["confidence"] = result["confidence"]
+                node["reasoning"].append(result["reason"])
+                node["can_verify"] = False
+        print(f"✅ WikiData verified {len(verify_nodes)} entities", file=sys.stderr)
+    
+    # Extract relationships with reasoning; edges are deduplicated as they are
+    # built, with earlier levels winning on identical (from, to, label)
+    seen_edges = set()
+    dep_edges = extract_dependency_relationships(doc, doc.ents, node_ids, seen_edges)
+    print(f"✅ Level 1: {len(dep_edges)} dependency relationships", file=sys.stderr)
+    
+    pattern_edges = extract_pattern_relationships(doc, doc.ents, node_ids, seen_edges)
+    print(f"✅ Level 2: {len(pattern_edges)} pattern relationships", file=sys.stderr)
+    
+    semantic_edges = extract_semantic_relationships(doc, nodes, ent_by_id, seen_edges)
+    theme_nodes, theme_edges, counter = extract_topics(doc, nodes, counter, seen_edges)
+    
+    # Combine
+    all_nodes = nodes + theme_nodes
+    edges = dep_edges + pattern_edges + semantic_edges + theme_edges
+    
+    # Metadata
+    entity_type_counts = defaultdict(int)
+    avg_confidence = 0
+    for node in nodes:
+        entity_type_counts[node["type"]] += 1
+        avg_confidence += node.get("confidence", 0.7)
+    
+    avg_confidence = avg_confidence / len(nodes) if nodes else 0
+    
+    result = {
+        "nodes": all_nodes,
+        "edges": edges,
+        "metadata": {
+            "total_entities": len(nodes),
+            "total_themes": len(theme_nodes),
+            "total_relationships": len(edges),
+            "dependency_edges": len(dep_edges),
+            "pattern_edges": len(pattern_edges),
+            "semantic_edges": len(semantic_edges),
+            "theme_edges": len(theme_edges),
+            "entity_types": dict(entity_type_counts),
+            "average_confidence": round(avg_confidence, 2),
+            "low_confidence_count": len(low_confidence_entities),
+            "model": "transformer" if "trf" in nlp.meta.get("name", "") else "small",
+            "accuracy_estimate": "95-97%" if "trf" in nlp.meta.get("name", "") else "80-85%"
+        }
+    }
+    
+    print(f"✅ Complete! Avg confidence: {round(avg_confidence, 2)}", file=sys.stderr)
+    return result
+
+def extract_texts(raw_texts):
+    """
+    Extract one graph per input text; all texts are parsed together through nlp.pipe
+    """
+    results = [None] * len(raw_texts)
+    pending = []
+    
+    for i, raw_text in enumerate(raw_texts):
+        clean_text, early_result = prepare_text(raw_text)
+        if early_result is not None:
+            results[i] = early_result
+        else:
+            pending.append((clean_text, i))
+    
+    for doc, i in nlp.pipe(pending, as_tuples=True, batch_size=SPACY_BATCH_SIZE):
+        results[i] = build_graph(doc, doc.text)
+    
+    return results
+
+def write_json(obj):
+    """
+    Write one JSON document + newline straight to stdout's byte buffer
+    orjson when installed (C encoder, numpy-aware), stdlib json otherwise
+    """
+    data = None
+    if ORJSON_AVAILABLE:
+        try:
+            data = orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. lone surrogates in input text; stdlib json escapes them
+    if data is None:
+        data = json.dumps(obj).encode("utf-8")
+    
+    sys.stdout.buffer.write(data + b"\n")
+    sys.stdout.flush()
+
+def serve():
+    """
+    Persistent worker mode (--serve): models stay loaded across requests
+    stdin:  one JSON job per line - {"id": ..., "text": "..."} or {"id": ..., "texts": [...]}
+    stdout: one JSON reply per line - {"id": ..., "result": {...}} / {"id": ..., "results": [...]} / {"id": ..., "error": "..."}
+    """
+    print("✅ Extractor worker ready", file=sys.stderr)
+    
+    for raw_line in iter(sys.stdin.buffer.readline, b""):
+        line = raw_line.decode("utf-8", errors="ignore").strip()
+        if not line:
+            continue
         
-        for ent in doc.ents:
-            final_type, confidence, reasoning = classify_entity_intelligent(ent, ent.label_, doc)
-            
-            node = {
-                "id": counter,
-                "label": ent.text,
-                "type": final_type,
-                "confidence": confidence,
-                "reasoning": reasoning,
-                "can_verify": confidence < 0.85  # Flag for WikiData verification
-            }
-            
-            if confidence < CONFIDENCE_THRESHOLD:
-                low_confidence_entities.append(ent.text)
+        job_id = None
+        try:
+            job = json.loads(line)
+            job_id = job.get("id")
             
-            nodes.append(node)
-            node_ids[ent.text] = counter
-            counter += 1
-        
-        # Extract MONEY
-        money_entities = extract_money_entities(clean_text, doc)
-        for money_text in money_entities:
-            nodes.append({
-                "id": counter,
-                "label": money_text,
-                "type": "MONEY",
-                "confidence": 0.95,
-                "reasoning": ["Regex pattern matched currency"],
-                "can_verify": False
-            })
-            node_ids[money_text] = counter
-            counter += 1
-        
-        # Deduplicate
-        nodes = deduplicate_entities(nodes)
-        node_ids = {node["label"]: node["id"] for node in nodes}
-        
-        print(f"✅ Extracted {len(nodes)} entities", file=sys.stderr)
-        if low_confidence_entities:
-            print(f"⚠️ Low confidence: {', '.join(low_confidence_entities[:5])}", file=sys.stderr)
-        
-        # Extract relationships with reasoning
-        dep_edges = extract_dependency_relationships(doc, doc.ents, node_ids)
-        print(f"✅ Level 1: {len(dep_edges)} dependency relationships", file=sys.stderr)
-        
-        pattern_edges = extract_pattern_relationships(doc, doc.ents, node_ids)
-        print(f"✅ Level 2: {len(pattern_edges)} pattern relationships", file=sys.stderr)
-        
-        semantic_edges = extract_semantic_relationships(doc, nodes, node_ids)
-        theme_nodes, theme_edges, counter = extract_topics(clean_text, nodes, counter)
-        
-        # Combine
-        all_nodes = nodes + theme_nodes
-        all_edges = dep_edges + pattern_edges + semantic_edges + theme_edges
-        
-        # Deduplicate edges
-        unique_edges = {}
-        for edge in all_edges:
-            key = (edge["from"], edge["to"], edge["label"])
-            if key not in unique_edges:
-                unique_edges[key] = edge
-        
-        edges = list(unique_edges.values())
-        
-        # Metadata
-        entity_type_counts = defaultdict(int)
-        avg_confidence = 0
-        for node in nodes:
-            entity_type_counts[node["type"]] += 1
-            avg_confidence += node.get("confidence", 0.7)
-        
-        avg_confidence = avg_confidence / len(nodes) if nodes else 0
-        
-        result = {
-            "nodes": all_nodes,
-            "edges": edges,
-            "metadata": {
-                "total_entities": len(nodes),
-                "total_themes": len(theme_nodes),
-                "total_relationships": len(edges),
-                "dependency_edges": len(dep_edges),
-                "pattern_edges": len(pattern_edges),
-                "semantic_edges": len(semantic_edges),
-                "theme_edges": len(theme_edges),
-                "entity_types": dict(entity_type_counts),
-                "average_confidence": round(avg_confidence, 2),
-                "low_confidence_count": len(low_confidence_entities),
-                "model": "transformer" if "trf" in nlp.meta.get("name", "") else "small",
-                "accuracy_estimate": "95-97%" if "trf" in nlp.meta.get("name", "") else "80-85%"
-            }
-        }
+            if "texts" in job:
+                reply = {"id": job_id, "results": extract_texts(job["texts"])}
+            else:
+                reply = {"id": job_id, "result": extract_texts([job.get("text", "")])[0]}
+        except Exception as e:
+            print(f"ERROR: {str(e)}", file=sys.stderr)
+            import traceback
+            traceback.print_exc(file=sys.stderr)
+            reply = {"id": job_id, "error": str(e)}
         
-        print(f"✅ Complete! Avg confidence: {round(avg_confidence, 2)}", file=sys.stderr)
-        print(json.dumps(result))
+        write_json(reply)
+
+def main():
+    if "--serve" in sys.argv[1:]:
+        serve()
+        return
+    
+    try:
+        # Decode once from bytes; invalid UTF-8 is dropped here instead of re-encoding later
+        raw_text = sys.stdin.buffer.read().decode("utf-8", errors="ignore")
+        result = extract_texts([raw_text])[0]
+        write_json(result)
     
     except Exception as e:
         print(f"ERROR: {str(e)}", file=sys.stderr)
@@ -4,9 +4,14 @@ Really Nicca - Gap Discovery Engine
 Detects structural holes using betweenness centrality + community detection
 """
 
+import os
 import sys
 import json
+import hashlib
+import requests
 import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
 
 # Try importing community detection library
 try:
@@ -16,140 +21,348 @@ except ImportError:
     print("Warning: python-louvain not installed. Run: pip install python-louvain", file=sys.stderr)
     COMMUNITY_AVAILABLE = False
 
+# Try importing igraph (C implementations of betweenness + Louvain)
+try:
+    import igraph
+    IGRAPH_AVAILABLE = True
+except ImportError:
+    IGRAPH_AVAILABLE = False
+
+# Try importing leidenalg (Leiden on igraph: faster than Louvain, better-connected partitions)
+try:
+    import leidenalg
+    LEIDEN_AVAILABLE = IGRAPH_AVAILABLE
+except ImportError:
+    LEIDEN_AVAILABLE = False
+
+# Try importing NetworKit (parallel C++ for very large graphs)
+try:
+    import networkit as nk
+    NETWORKIT_AVAILABLE = True
+except ImportError:
+    NETWORKIT_AVAILABLE = False
+
+# Try importing orjson (C JSON parser/encoder for the stdin/stdout protocol)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Try importing sentence transformers for semantic distance
 try:
     from sentence_transformers import SentenceTransformer
-    from sklearn.metrics.pairwise import cosine_similarity
     SEMANTIC_AVAILABLE = True
 except ImportError:
     SEMANTIC_AVAILABLE = False
 
+try:
+    import onnxruntime
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# MiniLM is ~5x smaller/faster than mpnet; plenty for a cluster-distance heuristic
+SEMANTIC_MODEL_NAME = os.getenv("GAP_SEMANTIC_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+USE_ONNX_QUANTIZATION = os.getenv("USE_ONNX_QUANTIZATION", "1") == "1"
+ONNX_MODEL_FILE = os.getenv("GAP_ONNX_MODEL_FILE", "onnx/model_qint8_avx512_vnni.onnx")  # shipped in the MiniLM repo
+# Resident embedding server (HuggingFace TEI-compatible POST /embed); skips the local model load
+EMBEDDING_SERVICE_URL = os.getenv("EMBEDDING_SERVICE_URL", "").rstrip("/")
+APPROX_BETWEENNESS_MIN_NODES = 500  # exact betweenness below this size
+APPROX_BETWEENNESS_SAMPLES = 256    # sampled source nodes above it
+NETWORKIT_MIN_NODES = 10000         # hand graphs this large to NetworKit when installed
+RESULT_CACHE_SIZE = 32              # analyses kept per worker process (LRU)
+
+_result_cache = {}  # graph digest -> result
+
+_semantic_model = None
+
+def get_semantic_model():
+    """Load the sentence transformer once per process (INT8 ONNX when available)."""
+    global _semantic_model
+    if _semantic_model is None and USE_ONNX_QUANTIZATION and ONNX_AVAILABLE:
+        try:
+            _semantic_model = SentenceTransformer(SEMANTIC_MODEL_NAME, backend="onnx",
+                                                  model_kwargs={"file_name": ONNX_MODEL_FILE})
+        except Exception as e:
+            print(f"Warning: INT8 ONNX model unavailable, using PyTorch: {str(e)}", file=sys.stderr)
+    if _semantic_model is None:
+        _semantic_model = SentenceTransformer(SEMANTIC_MODEL_NAME)
+    return _semantic_model
+
+def encode_texts(texts):
+    """
+    L2-normalized embeddings for a batch of texts, from the embedding service
+    when EMBEDDING_SERVICE_URL is set, otherwise from the local model.
+    """
+    if EMBEDDING_SERVICE_URL:
+        response = requests.post(f"{EMBEDDING_SERVICE_URL}/embed",
+                                 json={"inputs": texts, "normalize": True}, timeout=30)
+        response.raise_for_status()
+        emb = np.asarray(response.json(), dtype=np.float32)
+        return emb / np.linalg.norm(emb, axis=1, keepdims=True)
+    
+    return get_semantic_model().encode(texts, batch_size=64, convert_to_numpy=True,
+                                       normalize_embeddings=True, show_progress_bar=False)
+
+def read_json(data):
+    """Parse JSON from bytes (orjson when installed)"""
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
+def write_json(obj):
+    """Write one JSON document + newline straight to stdout's byte buffer (orjson when installed)"""
+    data = None
+    if ORJSON_AVAILABLE:
+        try:
+            data = orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. lone surrogates; stdlib json escapes them
+    if data is None:
+        data = json.dumps(obj).encode("utf-8")
+    
+    sys.stdout.buffer.write(data + b"\n")
+    sys.stdout.flush()
+
 def build_networkx_graph(nodes, edges):
     """Convert graph data to NetworkX format."""
     G = nx.Graph()
     
-    for node in nodes:
-        G.add_node(node['id'], label=node['label'], type=node.get('type', 'UNKNOWN'))
-    
-    for edge in edges:
-        G.add_edge(edge['from'], edge['to'], label=edge.get('label', 'related'))
+    # Bulk inserts: one call each instead of a Python-level add per node / edge
+    G.add_nodes_from((node['id'], {'label': node['label'], 'type': node.get('type', 'UNKNOWN')})
+                     for node in nodes)
+    G.add_edges_from((edge['from'], edge['to'], {'label': edge.get('label', 'related')})
+                     for edge in edges)
     
     return G
 
-def calculate_betweenness_centrality(G):
-    """Calculate betweenness centrality for all nodes."""
-    return nx.betweenness_centrality(G)
+def to_igraph(G):
+    """
+    Mirror a NetworkX graph as an igraph.Graph.
+    Returns: (igraph graph, node list mapping igraph vertex index -> node id)
+    """
+    node_list = list(G.nodes)
+    index = {node: i for i, node in enumerate(node_list)}
+    g = igraph.Graph(n=len(node_list), edges=[(index[u], index[v]) for u, v in G.edges], directed=False)
+    return g, node_list
+
+def use_networkit(G):
+    """NetworKit only pays off (thread pool, conversion) on very large graphs."""
+    return NETWORKIT_AVAILABLE and len(G) >= NETWORKIT_MIN_NODES
+
+def calculate_betweenness_centrality(G, k=None):
+    """
+    Calculate betweenness centrality for all nodes.
+    With igraph installed, exact betweenness runs in C (normalized like NetworkX).
+    Otherwise NetworkX is exact below APPROX_BETWEENNESS_MIN_NODES; above that,
+    Brandes is run from k sampled sources (O(kE) instead of O(VE)). Values only
+    rank bridge candidates, so bridge ordering on large graphs is approximate.
+    Graphs of NETWORKIT_MIN_NODES+ use NetworKit's parallel ApproxBetweenness.
+    """
+    if use_networkit(G) and k is None:
+        G_nk = nk.nxadapter.nx2nk(G)  # vertex i is the i-th node of G.nodes
+        approx = nk.centrality.ApproxBetweenness(G_nk, epsilon=0.05)
+        approx.run()
+        return dict(zip(G.nodes, approx.scores()))
+    
+    if IGRAPH_AVAILABLE and k is None:
+        g, node_list = to_igraph(G)
+        n = len(node_list)
+        scale = 2.0 / ((n - 1) * (n - 2)) if n > 2 else 1.0
+        return {node: bc * scale for node, bc in zip(node_list, g.betweenness(directed=False))}
+    
+    if k is None and len(G) >= APPROX_BETWEENNESS_MIN_NODES:
+        k = APPROX_BETWEENNESS_SAMPLES
+    if k is not None and k >= len(G):
+        k = None
+    return nx.betweenness_centrality(G, k=k, seed=0)
 
 def detect_communities(G):
-    """Detect community clusters using Louvain algorithm."""
+    """
+    Detect community clusters: parallel Louvain (NetworKit) on very large graphs,
+    else Leiden (leidenalg), else Louvain via igraph / python-louvain,
+    else connected components.
+    """
+    if use_networkit(G):
+        # PLM directly (detectCommunities would print a report to stdout)
+        G_nk = nk.nxadapter.nx2nk(G)
+        plm = nk.community.PLM(G_nk)
+        plm.run()
+        return dict(zip(G.nodes, plm.getPartition().getVector()))
+    
+    if LEIDEN_AVAILABLE:
+        g, node_list = to_igraph(G)
+        partition = leidenalg.find_partition(g, leidenalg.ModularityVertexPartition, seed=0)
+        return dict(zip(node_list, partition.membership))
+    
+    if IGRAPH_AVAILABLE:
+        g, node_list = to_igraph(G)
+        return dict(zip(node_list, g.community_multilevel().membership))
+    
     if not COMMUNITY_AVAILABLE:
         # Fallback: use connected components
         return {node: idx for idx, component in enumerate(nx.connected_components(G)) for node in component}
     
     return community_louvain.best_partition(G)
 
-def count_edges_between(G, nodes_c1, nodes_c2):
-    """Count edges connecting two communities."""
-    count = 0
-    for n1 in nodes_c1:
-        for n2 in nodes_c2:
-            if G.has_edge(n1, n2):
-                count += 1
-    return count
+def community_edge_counts(G, community_to_nodes, community_order):
+    """
+    Inter-community edge counts for all community pairs in one sparse product.
+    With A the adjacency matrix and M the node -> community incidence matrix,
+    (M.T @ A @ M)[i, j] counts edges between community_order[i] and [j].
+    Returns a dense (C, C) array.
+    """
+    node_order = list(G.nodes)
+    node_index = {n: i for i, n in enumerate(node_order)}
+    rows, cols = [], []
+    for j, c in enumerate(community_order):
+        for n in community_to_nodes[c]:
+            rows.append(node_index[n])
+            cols.append(j)
+    
+    A = nx.to_scipy_sparse_array(G, nodelist=node_order, weight=None, format='csr')
+    M = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(node_order), len(community_order)))
+    return (M.T @ A @ M).toarray()
 
 def get_cluster_keywords(G, community_nodes, top_n=5):
     """Get representative labels from a community."""
     labels = [G.nodes[node]['label'] for node in community_nodes if node in G.nodes]
     return labels[:top_n]
 
-def calculate_semantic_distance(cluster_1_keywords, cluster_2_keywords):
-    """Calculate semantic distance between two clusters using embeddings."""
-    if not SEMANTIC_AVAILABLE or not cluster_1_keywords or not cluster_2_keywords:
-        return 0.5  # Default medium distance
+def calculate_semantic_distances(keyword_lists):
+    """
+    Pairwise semantic distance (1 - cosine similarity) between clusters.
+    All cluster texts are encoded in one batch; similarities are one matmul.
+    Returns ((k, k) array, ok); 0.5 (default medium distance) where unavailable,
+    ok is False when encoding failed and the defaults stand in for real distances.
+    """
+    distances = np.full((len(keyword_lists), len(keyword_lists)), 0.5)
+    present = [i for i, keywords in enumerate(keyword_lists) if keywords]
+    
+    if not (SEMANTIC_AVAILABLE or EMBEDDING_SERVICE_URL) or not present:
+        return distances, True
     
     try:
-        model = SentenceTransformer('all-mpnet-base-v2')
-        
-        text_c1 = " ".join(cluster_1_keywords)
-        text_c2 = " ".join(cluster_2_keywords)
-        
-        emb_c1 = model.encode([text_c1])
-        emb_c2 = model.encode([text_c2])
-        
-        similarity = cosine_similarity(emb_c1, emb_c2)[0][0]
-        distance = 1 - similarity
-        
-        return float(distance)
+        emb = encode_texts([" ".join(keyword_lists[i]) for i in present])
+        distances[np.ix_(present, present)] = 1 - emb @ emb.T
     except Exception as e:
         print(f"Warning: Semantic distance calculation failed: {str(e)}", file=sys.stderr)
-        return 0.5
+        return distances, False
+    
+    return distances, True
 
-def find_bridge_nodes(betweenness, nodes_c1, nodes_c2, top_n=3):
-    """Find nodes with highest betweenness centrality connecting two communities."""
-    all_nodes = set(nodes_c1 + nodes_c2)
-    bridge_candidates = [(node, bc) for node, bc in betweenness.items() if node in all_nodes]
-    bridge_candidates.sort(key=lambda x: x[1], reverse=True)
-    return [node for node, _ in bridge_candidates[:top_n]]
+def find_bridge_nodes(bc_values, members_c1, members_c2, top_n=3):
+    """
+    Find nodes with highest betweenness centrality connecting two communities.
+    bc_values is betweenness as an array in node order; members_* are integer
+    node positions. Top-n selection is a partition (no full sort); ties go to
+    the node that comes first in node order.
+    Returns node positions, best first.
+    """
+    members = np.concatenate((members_c1, members_c2))
+    scores = bc_values[members]
+    
+    if len(members) > top_n:
+        kth = np.partition(scores, len(scores) - top_n)[len(scores) - top_n]
+        above = members[scores > kth]
+        ties = np.sort(members[scores == kth])[:top_n - len(above)]
+        members = np.concatenate((above, ties))
+    
+    order = np.lexsort((members, -bc_values[members]))
+    return members[order].tolist()
+
+def top_k_positions(scores, k):
+    """
+    Positions of the k largest scores, best first, via np.partition (O(n), no full sort).
+    Ties are broken by position, matching a stable descending sort.
+    """
+    n = len(scores)
+    if n > k:
+        kth = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - len(above)]
+        positions = np.concatenate((above, ties))
+    else:
+        positions = np.arange(n)
+    return positions[np.lexsort((positions, -scores[positions]))]
 
 def find_structural_gaps(G, communities, betweenness, min_cluster_size=3, max_gaps=10):
-    """Identify structural gaps between communities."""
+    """
+    Identify structural gaps between communities.
+    Returns (gaps, semantic_ok); semantic_ok is False when semantic distances fell back to defaults.
+    """
     gaps = []
     community_ids = set(communities.values())
     
-    for c1 in community_ids:
-        for c2 in community_ids:
-            if c1 >= c2:
-                continue
-            
-            # Get nodes in each community
-            nodes_c1 = [n for n, c in communities.items() if c == c1]
-            nodes_c2 = [n for n, c in communities.items() if c == c2]
-            
-            # Filter small clusters
-            if len(nodes_c1) < min_cluster_size or len(nodes_c2) < min_cluster_size:
-                continue
-            
-            # Count inter-community edges
-            inter_edges = count_edges_between(G, nodes_c1, nodes_c2)
-            
-            # Calculate connectivity
-            max_possible_edges = len(nodes_c1) * len(nodes_c2)
-            connectivity = inter_edges / max_possible_edges if max_possible_edges > 0 else 0
-            
-            # Get cluster keywords
-            cluster_1_keywords = get_cluster_keywords(G, nodes_c1)
-            cluster_2_keywords = get_cluster_keywords(G, nodes_c2)
-            
-            # Calculate semantic distance
-            semantic_distance = calculate_semantic_distance(cluster_1_keywords, cluster_2_keywords)
-            
-            # Gap score: prioritize large clusters with low connectivity
-            cluster_size_score = len(nodes_c1) * len(nodes_c2)
-            connectivity_penalty = (1 - connectivity)
-            semantic_bonus = semantic_distance
-            
-            gap_score = cluster_size_score * connectivity_penalty * (1 + semantic_bonus)
-            
-            # Only include significant gaps (low connectivity)
-            if connectivity < 0.2:  # Less than 20% connectivity
-                gaps.append({
-                    "community_1": int(c1),
-                    "community_2": int(c2),
-                    "nodes_1": nodes_c1,
-                    "nodes_2": nodes_c2,
-                    "cluster_1_keywords": cluster_1_keywords,
-                    "cluster_2_keywords": cluster_2_keywords,
-                    "gap_score": float(gap_score),
-                    "connectivity": float(connectivity),
-                    "semantic_distance": float(semantic_distance),
-                    "potential_connections": inter_edges,
-                    "cluster_size": len(nodes_c1) + len(nodes_c2),
-                    "bridge_nodes": find_bridge_nodes(betweenness, nodes_c1, nodes_c2)
-                })
-    
-    # Sort by gap score (descending)
-    gaps.sort(key=lambda x: x['gap_score'], reverse=True)
-    return gaps[:max_gaps]
+    # Group nodes by community in one pass; everything per-community is computed once
+    community_to_nodes = {}
+    for n, c in communities.items():
+        community_to_nodes.setdefault(c, []).append(n)
+    
+    # Filter small clusters before pairing them up
+    valid = [c for c in community_ids if len(community_to_nodes[c]) >= min_cluster_size]
+    if len(valid) < 2:
+        return gaps, True
+    
+    # Betweenness as a float array in node order; communities as integer positions into it
+    bc_nodes = list(betweenness)
+    bc_values = np.fromiter(betweenness.values(), dtype=np.float64, count=len(bc_nodes))
+    node_rank = {node: i for i, node in enumerate(bc_nodes)}
+    community_members = {c: np.array([node_rank[n] for n in community_to_nodes[c]], dtype=np.int64)
+                         for c in valid}
+    
+    # Score every community pair at once on C x C matrices
+    inter_edges = community_edge_counts(G, community_to_nodes, valid)
+    sizes = np.array([len(community_to_nodes[c]) for c in valid], dtype=float)
+    
+    # Calculate connectivity
+    max_possible_edges = np.outer(sizes, sizes)
+    connectivity = inter_edges / max_possible_edges
+    
+    # Each unordered pair once (c1 < c2), and only significant gaps (< 20% connectivity)
+    ids = np.array(valid)
+    candidates = (ids[:, None] < ids[None, :]) & (connectivity < 0.2)
+    if not candidates.any():
+        return gaps, True
+    
+    # Keywords and embeddings only for clusters that appear in a surviving pair
+    needed = np.flatnonzero(candidates.any(axis=0) | candidates.any(axis=1))
+    community_keywords = {valid[i]: get_cluster_keywords(G, community_to_nodes[valid[i]]) for i in needed}
+    semantic_distances, semantic_ok = calculate_semantic_distances([community_keywords.get(c, []) for c in valid])
+    
+    # Gap score: prioritize large clusters with low connectivity
+    cluster_size_score = max_possible_edges
+    connectivity_penalty = (1 - connectivity)
+    semantic_bonus = semantic_distances
+    
+    gap_score = cluster_size_score * connectivity_penalty * (1 + semantic_bonus)
+    
+    # Keep only the max_gaps best pairs (partial selection, no full sort);
+    # gap dicts and bridge nodes are built for those alone
+    pairs = np.argwhere(candidates)
+    top = top_k_positions(gap_score[pairs[:, 0], pairs[:, 1]], max_gaps)
+    
+    for i, j in pairs[top]:
+        c1, c2 = valid[i], valid[j]
+        nodes_c1 = community_to_nodes[c1]
+        nodes_c2 = community_to_nodes[c2]
+        
+        gaps.append({
+            "community_1": int(c1),
+            "community_2": int(c2),
+            "nodes_1": nodes_c1,
+            "nodes_2": nodes_c2,
+            "cluster_1_keywords": community_keywords[c1],
+            "cluster_2_keywords": community_keywords[c2],
+            "gap_score": float(gap_score[i, j]),
+            "connectivity": float(connectivity[i, j]),
+            "semantic_distance": float(semantic_distances[i, j]),
+            "potential_connections": int(inter_edges[i, j]),
+            "cluster_size": len(nodes_c1) + len(nodes_c2),
+            "bridge_nodes": [bc_nodes[k] for k in find_bridge_nodes(bc_values, community_members[c1],
+                                                                    community_members[c2])]
+        })
+    
+    return gaps, semantic_ok
 
 def generate_gap_insights(gap, G):
     """Generate human-readable insights for a gap."""
@@ -179,55 +392,106 @@ def generate_gap_insights(gap, G):
     
     return insight
 
-def main():
-    try:
-        # Read graph data from stdin
-        graph_data = json.loads(sys.stdin.read())
-        
-        nodes = graph_data.get('nodes', [])
-        edges = graph_data.get('edges', [])
-        
-        if len(nodes) < 5 or len(edges) < 2:
-            print(json.dumps({
-                "gaps": [], 
-                "message": "Graph too small for gap analysis (need 5+ nodes, 2+ edges)",
-                "num_communities": 0,
-                "num_gaps_detected": 0
-            }))
-            sys.exit(0)
-        
-        # Build NetworkX graph
-        G = build_networkx_graph(nodes, edges)
-        
-        # Calculate betweenness centrality
-        betweenness = calculate_betweenness_centrality(G)
-        print(f"✅ Calculated betweenness centrality for {len(betweenness)} nodes", file=sys.stderr)
-        
-        # Detect communities
-        communities = detect_communities(G)
-        num_communities = len(set(communities.values()))
-        print(f"✅ Detected {num_communities} communities", file=sys.stderr)
-        
-        # Find structural gaps
-        gaps = find_structural_gaps(G, communities, betweenness)
-        print(f"✅ Found {len(gaps)} structural gaps", file=sys.stderr)
-        
-        # Generate insights
-        gap_insights = [generate_gap_insights(gap, G) for gap in gaps]
-        
-        result = {
-            "gaps": gap_insights,
+def graph_digest(nodes, edges):
+    """Content hash of the graph (order-sensitive: node order shapes cluster keywords)"""
+    return hashlib.blake2b(json.dumps([nodes, edges], sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+def analyze_graph(graph_data, use_cache=False):
+    """
+    Full gap analysis for one {"nodes": [...], "edges": [...]} graph
+    use_cache: answer repeated graphs from an in-process LRU cache (--serve mode only;
+    a one-shot run would pay for the digest without ever hitting it)
+    """
+    nodes = graph_data.get('nodes', [])
+    edges = graph_data.get('edges', [])
+    
+    if len(nodes) < 5 or len(edges) < 2:
+        return {
+            "gaps": [], 
+            "message": "Graph too small for gap analysis (need 5+ nodes, 2+ edges)",
+            "num_communities": 0,
+            "num_gaps_detected": 0
+        }
+    
+    key = graph_digest(nodes, edges) if use_cache else None
+    if key in _result_cache:
+        print("✅ Gap analysis served from cache", file=sys.stderr)
+        result = _result_cache.pop(key)
+        _result_cache[key] = result  # mark as most recently used
+        return result
+    
+    # Build NetworkX graph
+    G = build_networkx_graph(nodes, edges)
+    
+    # Calculate betweenness centrality
+    betweenness = calculate_betweenness_centrality(G)
+    print(f"✅ Calculated betweenness centrality for {len(betweenness)} nodes", file=sys.stderr)
+    
+    # Detect communities
+    communities = detect_communities(G)
+    num_communities = len(set(communities.values()))
+    print(f"✅ Detected {num_communities} communities", file=sys.stderr)
+    
+    # Find structural gaps
+    gaps, semantic_ok = find_structural_gaps(G, communities, betweenness)
+    print(f"✅ Found {len(gaps)} structural gaps", file=sys.stderr)
+    
+    # Generate insights
+    gap_insights = [generate_gap_insights(gap, G) for gap in gaps]
+    
+    result = {
+        "gaps": gap_insights,
+        "num_communities": num_communities,
+        "num_gaps_detected": len(gaps),
+        "analysis_metadata": {
+            "total_nodes": len(nodes),
+            "total_edges": len(edges),
             "num_communities": num_communities,
-            "num_gaps_detected": len(gaps),
-            "analysis_metadata": {
-                "total_nodes": len(nodes),
-                "total_edges": len(edges),
-                "num_communities": num_communities,
-                "average_gap_score": sum(g['gap_score'] for g in gaps) / len(gaps) if gaps else 0
-            }
+            "average_gap_score": sum(g['gap_score'] for g in gaps) / len(gaps) if gaps else 0
         }
+    }
+    
+    # Results built on fallback semantic distances are not cached, so a retry can recover
+    if key is not None and semantic_ok:
+        if len(_result_cache) >= RESULT_CACHE_SIZE:
+            _result_cache.pop(next(iter(_result_cache)))
+        _result_cache[key] = result
+    return result
+
+def serve():
+    """
+    Persistent worker mode (--serve): imports and the embedding model stay loaded across requests
+    stdin:  one JSON job per line - {"id": ..., "nodes": [...], "edges": [...]}
+    stdout: one JSON reply per line - {"id": ..., "result": {...}} / {"id": ..., "error": "..."}
+    """
+    print("✅ Gap analyzer worker ready", file=sys.stderr)
+    
+    for raw_line in iter(sys.stdin.buffer.readline, b""):
+        if not raw_line.strip():
+            continue
+        
+        job_id = None
+        try:
+            job = read_json(raw_line)
+            job_id = job.get("id")
+            reply = {"id": job_id, "result": analyze_graph(job, use_cache=True)}
+        except Exception as e:
+            print(f"PYTHON ERROR: {str(e)}", file=sys.stderr)
+            import traceback
+            traceback.print_exc(file=sys.stderr)
+            reply = {"id": job_id, "error": str(e)}
         
-        print(json.dumps(result))
+        write_json(reply)
+
+def main():
+    if "--serve" in sys.argv[1:]:
+        serve()
+        return
+    
+    try:
+        # Read graph data from stdin
+        graph_data = read_json(sys.stdin.buffer.read())
+        write_json(analyze_graph(graph_data))
     
     except Exception as e:
         print(f"PYTHON ERROR: {str(e)}", file=sys.stderr)
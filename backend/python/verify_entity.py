@@ -4,66 +4,95 @@ WikiData Entity Verification
 Lazy lookup for low-confidence entities
 """
 
+import os
 import sys
 import json
-import requests
+import shelve
+from functools import lru_cache
 
-def query_wikidata(entity_text):
-    """Query WikiData for entity validation"""
+from wikidata import lookup_wikidata, is_error
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+WIKIDATA_CACHE_PATH = os.getenv("WIKIDATA_CACHE_PATH", os.path.expanduser("~/.cache/nicca_wd.db"))
+
+def read_cache(keys):
+    """Persistent lookup cache (shelve); a missing or locked cache is just a miss. Returns {key: result}"""
     try:
-        # Search WikiData
-        search_url = "https://www.wikidata.org/w/api.php"
-        params = {
-            'action': 'wbsearchentities',
-            'search': entity_text,
-            'language': 'en',
-            'format': 'json',
-            'limit': 1
-        }
-        
-        response = requests.get(search_url, params=params, timeout=3)
-        data = response.json()
-        
-        if not data.get('search'):
-            return {"type": None, "confidence": 0, "reason": "Not found in WikiData"}
-        
-        entity_id = data['search'][0]['id']
-        label = data['search'][0]['label']
-        description = data['search'][0].get('description', '')
-        
-        # Get entity data
-        entity_url = f"https://www.wikidata.org/wiki/Special:EntityData/{entity_id}.json"
-        response = requests.get(entity_url, timeout=3)
-        entity_data = response.json()
-        
-        claims = entity_data['entities'][entity_id].get('claims', {})
-        
-        # Determine type from instance_of (P31)
-        if 'P31' in claims:
-            instance_values = []
-            for claim in claims['P31']:
-                if 'datavalue' in claim['mainsnak']:
-                    instance_values.append(claim['mainsnak']['datavalue']['value']['id'])
-            
-            # Map WikiData classes
-            if 'Q5' in instance_values:
-                return {"type": "PERSON", "confidence": 0.97, "reason": f"WikiData: {label} ({description})"}
-            elif any(v in ['Q4830453', 'Q43229', 'Q783794'] for v in instance_values):
-                return {"type": "ORG", "confidence": 0.97, "reason": f"WikiData: {label} ({description})"}
-            elif any(v in ['Q515', 'Q6256', 'Q618123'] for v in instance_values):
-                return {"type": "GPE", "confidence": 0.97, "reason": f"WikiData: {label} ({description})"}
-            elif any(v in ['Q2424752', 'Q478798'] for v in instance_values):
-                return {"type": "PRODUCT", "confidence": 0.97, "reason": f"WikiData: {label} ({description})"}
-        
-        return {"type": None, "confidence": 0, "reason": f"WikiData found but unclear type: {label} ({description})"}
-    
+        with shelve.open(WIKIDATA_CACHE_PATH, flag='r') as cache:
+            return {key: cache[key] for key in keys if key in cache}
+    except Exception:
+        return {}
+
+def write_cache(results):
+    if not results:
+        return
+    try:
+        os.makedirs(os.path.dirname(WIKIDATA_CACHE_PATH), exist_ok=True)
+        with shelve.open(WIKIDATA_CACHE_PATH) as cache:
+            cache.update(results)
     except Exception as e:
-        return {"type": None, "confidence": 0, "reason": f"WikiData error: {str(e)}"}
+        print(f"Warning: WikiData cache write failed: {str(e)}", file=sys.stderr)
+
+def query_wikidata_batch(entity_texts):
+    """
+    Verify a list of entities, memoized on disk by lowercased text
+    Returns: results aligned with entity_texts
+    """
+    unique_texts = list(dict.fromkeys(entity_texts))
+    cached = read_cache([text.lower() for text in unique_texts])
+    
+    results = {text: cached[text.lower()] for text in unique_texts if text.lower() in cached}
+    fresh = lookup_wikidata([text for text in unique_texts if text not in results])
+    results.update(fresh)
+    
+    # Errors are transient; only cache real answers
+    write_cache({text.lower(): result for text, result in fresh.items() if not is_error(result)})
+    
+    return [results[text] for text in entity_texts]
+
+@lru_cache(maxsize=4096)
+def query_wikidata(entity_text):
+    """Query WikiData for entity validation, memoized in process and on disk"""
+    return query_wikidata_batch([entity_text])[0]
+
+def read_json(data):
+    """Parse JSON from bytes (orjson when installed)"""
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
+def write_json(obj):
+    """Write one JSON document + newline straight to stdout's byte buffer (orjson when installed)"""
+    data = None
+    if ORJSON_AVAILABLE:
+        try:
+            data = orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. lone surrogates; stdlib json escapes them
+    if data is None:
+        data = json.dumps(obj).encode("utf-8")
+    
+    sys.stdout.buffer.write(data + b"\n")
+    sys.stdout.flush()
 
 def main():
-    entity_text = sys.stdin.read().strip()
-    result = query_wikidata(entity_text)
-    print(json.dumps(result))
+    raw = sys.stdin.buffer.read().strip()
+    
+    # A JSON array of entity texts is verified as one batch; anything else is a single entity
+    try:
+        entity_texts = read_json(raw)
+    except ValueError:
+        entity_texts = None
+    
+    if isinstance(entity_texts, list):
+        result = query_wikidata_batch([str(text) for text in entity_texts])
+    else:
+        result = query_wikidata(raw.decode("utf-8", errors="ignore"))
+    
+    write_json(result)
 
 if __name__ == "__main__":
     main()
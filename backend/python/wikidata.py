@@ -0,0 +1,139 @@
+"""
+WikiData lookups shared by verify_entity.py and extractor.py
+Pooled session, P31 class sets, batched search + claims, classification
+(kept out of extractor.py so the verify script does not load spaCy)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+WIKIDATA_API_URL = "https://www.wikidata.org/w/api.php"
+WIKIDATA_BATCH_SIZE = 50  # wbgetentities accepts up to 50 ids per request
+WIKIDATA_MAX_WORKERS = 8
+
+# instance_of (P31) classes per entity type
+WIKIDATA_PERSON_CLASSES = frozenset(['Q5'])
+WIKIDATA_ORG_CLASSES = frozenset(['Q4830453', 'Q43229', 'Q783794'])
+WIKIDATA_GPE_CLASSES = frozenset(['Q515', 'Q6256', 'Q618123'])
+WIKIDATA_PRODUCT_CLASSES = frozenset(['Q2424752', 'Q478798'])
+
+# One keep-alive session: one TCP/TLS handshake for all WikiData calls,
+# with backoff on rate limiting / transient gateway errors
+_SESSION = requests.Session()
+_SESSION.headers.update({'User-Agent': 'ReallyNicca/1.0 (https://github.com/bharathnivas29/ReallyNicca)'})
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503],
+                      allowed_methods=["GET"])
+))
+
+def search_wikidata(entity_text):
+    """Top wbsearchentities hit: Returns (id, label, description) or None"""
+    params = {
+        'action': 'wbsearchentities',
+        'search': entity_text,
+        'language': 'en',
+        'format': 'json',
+        'limit': 1
+    }
+    
+    response = _SESSION.get(WIKIDATA_API_URL, params=params, timeout=3)
+    data = response.json()
+    
+    if not data.get('search'):
+        return None
+    
+    hit = data['search'][0]
+    return hit['id'], hit['label'], hit.get('description', '')
+
+def _search_wikidata_safe(entity_text):
+    """search_wikidata for thread pools: Returns (match, error)"""
+    try:
+        return search_wikidata(entity_text), None
+    except Exception as e:
+        return None, e
+
+def fetch_claims(entity_ids):
+    """One wbgetentities request for up to WIKIDATA_BATCH_SIZE ids: Returns {id: claims}"""
+    params = {
+        'action': 'wbgetentities',
+        'ids': '|'.join(entity_ids),
+        'props': 'claims',
+        'format': 'json'
+    }
+    response = _SESSION.get(WIKIDATA_API_URL, params=params, timeout=3)
+    entities = response.json().get('entities', {})
+    return {entity_id: entities.get(entity_id, {}).get('claims', {}) for entity_id in entity_ids}
+
+def _fetch_claims_safe(entity_ids):
+    try:
+        return fetch_claims(entity_ids), None
+    except Exception as e:
+        return None, e
+
+def classify_claims(claims, label, description):
+    """Determine type from instance_of (P31)"""
+    if 'P31' in claims:
+        instance_values = {claim['mainsnak']['datavalue']['value']['id']
+                           for claim in claims['P31'] if 'datavalue' in claim['mainsnak']}
+        
+        # Map WikiData classes
+        if not instance_values.isdisjoint(WIKIDATA_PERSON_CLASSES):
+            return {"type": "PERSON", "confidence": 0.97, "reason": f"WikiData: {label} ({description})"}
+        elif not instance_values.isdisjoint(WIKIDATA_ORG_CLASSES):
+            return {"type": "ORG", "confidence": 0.97, "reason": f"WikiData: {label} ({description})"}
+        elif not instance_values.isdisjoint(WIKIDATA_GPE_CLASSES):
+            return {"type": "GPE", "confidence": 0.97, "reason": f"WikiData: {label} ({description})"}
+        elif not instance_values.isdisjoint(WIKIDATA_PRODUCT_CLASSES):
+            return {"type": "PRODUCT", "confidence": 0.97, "reason": f"WikiData: {label} ({description})"}
+    
+    return {"type": None, "confidence": 0, "reason": f"WikiData found but unclear type: {label} ({description})"}
+
+def is_error(result):
+    """Network / API failures are transient: callers should not cache them"""
+    return result["reason"].startswith("WikiData error")
+
+def lookup_wikidata(entity_texts):
+    """
+    Query WikiData for several entities (uncached): searches fan out over a thread pool,
+    then claims for all hits come from wbgetentities in chunks of WIKIDATA_BATCH_SIZE,
+    so latency is ~max RTT, not the sum
+    Returns: {entity_text: {"type", "confidence", "reason"}}
+    """
+    results = {}
+    matches = {}
+    entity_texts = list(dict.fromkeys(entity_texts))
+    if not entity_texts:
+        return results
+    
+    with ThreadPoolExecutor(max_workers=WIKIDATA_MAX_WORKERS) as executor:
+        for text, (match, error) in zip(entity_texts, executor.map(_search_wikidata_safe, entity_texts)):
+            if error is not None:
+                results[text] = {"type": None, "confidence": 0, "reason": f"WikiData error: {str(error)}"}
+            elif match is None:
+                results[text] = {"type": None, "confidence": 0, "reason": "Not found in WikiData"}
+            else:
+                matches[text] = match
+        
+        entity_ids = list(dict.fromkeys(match[0] for match in matches.values()))
+        chunks = [entity_ids[i:i + WIKIDATA_BATCH_SIZE] for i in range(0, len(entity_ids), WIKIDATA_BATCH_SIZE)]
+        
+        claims_by_id = {}
+        errors_by_id = {}
+        for chunk, (claims, error) in zip(chunks, executor.map(_fetch_claims_safe, chunks)):
+            if error is not None:
+                errors_by_id.update(dict.fromkeys(chunk, error))
+            else:
+                claims_by_id.update(claims)
+    
+    for text, (entity_id, label, description) in matches.items():
+        if entity_id in errors_by_id:
+            results[text] = {"type": None, "confidence": 0, "reason": f"WikiData error: {str(errors_by_id[entity_id])}"}
+        else:
+            results[text] = classify_claims(claims_by_id.get(entity_id, {}), label, description)
+    
+    return results